@@ -1,5 +1,6 @@
 import pandas as pd
 import os
+from interchange import save_table
 
 DATA_DIR = os.path.join("01_Data", "Processed_Data")
 
@@ -25,7 +26,7 @@ def clean_energy_data():
     
     df['Date'] = df['Year'].astype(str) + '-' + df['Month_Num'].astype(str).str.zfill(2) + '-01'
     
-    df.to_csv(os.path.join(DATA_DIR, "energy_prices_final.csv"), index=False)
+    save_table(df, os.path.join(DATA_DIR, "energy_prices_final.csv"))
     print("Saved energy_prices_final.csv")
 
 if __name__ == "__main__":
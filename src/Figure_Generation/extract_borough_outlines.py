@@ -1,5 +1,6 @@
 import pandas as pd
 import os
+from interchange import save_table
 
 DATA_DIR = os.path.join("01_Data", "Spatial_Data")
 INPUT_FILE = os.path.join(DATA_DIR, "map_polygons_final.csv")
@@ -34,7 +35,7 @@ def extract_borough_outlines():
                 })
                 
     df_outlines = pd.DataFrame(outlines)
-    df_outlines.to_csv(os.path.join(DATA_DIR, "borough_outlines.csv"), index=False)
+    save_table(df_outlines, os.path.join(DATA_DIR, "borough_outlines.csv"))
     print(f"Done. Extracted {len(df_outlines)} boundary segments.")
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@ import sqlite3
 import struct
 import pandas as pd
 import os
+from interchange import save_table
 
 SPATIAL_DIR = os.path.join("01_Data", "Spatial_Data")
 RAW_DIR = os.path.join("01_Data", "Raw_Data")
@@ -92,7 +93,7 @@ def extract_polygons():
         if count % 50 == 0: print(f"Processed {count} MSOAs...")
 
     df = pd.DataFrame(poly_data)
-    df.to_csv(os.path.join(SPATIAL_DIR, "map_polygons_final.csv"), index=False)
+    save_table(df, os.path.join(SPATIAL_DIR, "map_polygons_final.csv"))
     print(f"Done. Extracted {len(df)} points for {count} MSOAs.")
 
 if __name__ == "__main__":
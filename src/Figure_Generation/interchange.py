@@ -0,0 +1,18 @@
+import os
+
+# Below this size read.csv is already fast and loading arrow in each Rscript
+# process costs more than it saves; only the map polygons clear it today
+FEATHER_MIN_BYTES = 1 << 20
+
+def save_table(df, csv_path):
+    """Writes df as CSV and, for large tables when pyarrow is available, a typed Feather copy alongside it."""
+    df.to_csv(csv_path, index=False)
+    feather_path = os.path.splitext(csv_path)[0] + ".feather"
+    if os.path.getsize(csv_path) >= FEATHER_MIN_BYTES:
+        try:
+            df.reset_index(drop=True).to_feather(feather_path)
+            return
+        except ImportError:
+            pass
+    # The R scripts fall back to the CSV; drop any stale copy
+    if os.path.exists(feather_path): os.remove(feather_path)
@@ -1,5 +1,6 @@
 import pandas as pd
 import os
+from interchange import save_table
 
 RAW_DIR = os.path.join("01_Data", "Raw_Data")
 METADATA_DIR = os.path.join("01_Data", "Metadata")
@@ -23,7 +24,7 @@ def prep_deprivation_data():
     
     national_quantiles = imd_msoa['Income_Score'].quantile([0.6, 0.7, 0.8, 0.9])
     
-    df_sample.to_csv(os.path.join(PROCESSED_DIR, "deprivation_distribution.csv"), index=False)
+    save_table(df_sample, os.path.join(PROCESSED_DIR, "deprivation_distribution.csv"))
     
     with open(os.path.join(PROCESSED_DIR, "quantiles.txt"), "w") as f:
         f.write(f"Top10,{imd_msoa['Income_Score'].quantile(0.9)}\n")
@@ -0,0 +1,61 @@
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError, URLError
+import argparse
+import json
+import sys
+
+DEFAULT_PORT = 8765 # Keep in sync with analysis_daemon.DEFAULT_PORT
+
+def call(port, path, payload=None):
+    data = None if payload is None else json.dumps(payload).encode()
+    req = Request(f"http://127.0.0.1:{port}{path}", data=data,
+                  headers={'Content-Type': 'application/json'})
+    try:
+        with urlopen(req) as resp:
+            return json.load(resp)
+    except HTTPError as e:
+        sys.exit(f"Error {e.code}: {json.load(e).get('error')}")
+    except URLError as e:
+        sys.exit(f"Cannot reach analysis daemon on port {port} ({e.reason}). "
+                 "Start it with: python 02_Code/Model_Analysis/analysis_daemon.py")
+
+def print_result(res):
+    print(f"Formula: {res['formula']}")
+    print(f"Observations: {res['nobs']}  (data v{res['data_version']}, "
+          f"{'cached, ' if res['cached'] else ''}{res['elapsed_ms']:.1f} ms)")
+    print(f"{'Term':<14}{'Estimate':>10}{'Std. Err.':>11}{'P-value':>9}{'Lower CI':>10}{'Upper CI':>10}")
+    for c in res['coefficients']:
+        print(f"{c['term']:<14}{c['estimate']:>10.4f}{c['std_error']:>11.4f}{c['pvalue']:>9.4f}"
+              f"{c['lower']:>10.4f}{c['upper']:>10.4f}")
+
+if __name__ == "__main__":
+    # Deliberately avoids pandas/linearmodels so that each query starts instantly
+    parser = argparse.ArgumentParser(description="Query a running analysis_daemon.py")
+    parser.add_argument('kind', choices=['did', 'event_study', 'status', 'reload'])
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--outcome')
+    parser.add_argument('--treatment', help="Panel column used as the treatment indicator")
+    parser.add_argument('--years', type=int, nargs=2, metavar=('START', 'END'))
+    parser.add_argument('--post-year', type=int)
+    parser.add_argument('--ref-year', type=int, help="Omitted year in the event study")
+    parser.add_argument('--cov-type', choices=['clustered', 'conley'])
+    parser.add_argument('--cutoff-km', type=float)
+    parser.add_argument('--kernel', choices=['bartlett', 'uniform'])
+    parser.add_argument('--lag-cutoff', type=int)
+    parser.add_argument('--json', action='store_true', help="Print the raw JSON response")
+    args = parser.parse_args()
+
+    if args.kind == 'status':
+        print(json.dumps(call(args.port, '/status'), indent=2))
+    elif args.kind == 'reload':
+        print(json.dumps(call(args.port, '/reload', {}), indent=2))
+    else:
+        fields = ['outcome', 'treatment', 'years', 'post_year', 'ref_year',
+                  'cov_type', 'cutoff_km', 'kernel', 'lag_cutoff']
+        payload = {'kind': args.kind}
+        payload.update({f: getattr(args, f) for f in fields if getattr(args, f) is not None})
+        res = call(args.port, '/run', payload)
+        if args.json:
+            print(json.dumps(res, indent=2))
+        else:
+            print_result(res)
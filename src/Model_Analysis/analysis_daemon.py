@@ -0,0 +1,246 @@
+import pandas as pd
+from linearmodels.panel import PanelOLS
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from did_analysis import load_data, fit_panel, RAW_DIR, METADATA_DIR
+from spatial_hac import load_centroids, CENTROIDS_FILE, KERNELS
+import argparse
+import json
+import time
+import os
+import glob
+
+DEFAULT_PORT = 8765
+INPUT_PATTERNS = [
+    os.path.join(METADATA_DIR, "policy_eligibility.csv"),
+    os.path.join(RAW_DIR, "lookup.csv"),
+    os.path.join(RAW_DIR, "deprivation.csv"),
+    os.path.join(RAW_DIR, "health_*.csv"),
+    os.path.join(RAW_DIR, "domestic-*.csv"),
+    CENTROIDS_FILE,
+]
+DEFAULTS = {
+    'kind': 'did',
+    'outcome': 'COPD_Rate',
+    'treatment': 'Eligible',
+    'post_year': 2019,
+    'ref_year': 2018,
+    'years': [2015, 2024],
+    'cov_type': 'clustered',
+    'cutoff_km': 10.0,
+    'kernel': 'bartlett',
+    'lag_cutoff': None,
+}
+KINDS = ('did', 'event_study')
+COV_TYPES = ('clustered', 'conley')
+
+class SpecError(ValueError):
+    """A request that cannot be run as given; reported to the client as HTTP 400."""
+
+def _is_int(v):
+    return isinstance(v, int) and not isinstance(v, bool)
+
+def validate_spec(request, df, centroids=None):
+    """Merges a request over DEFAULTS and checks every field before any fit runs."""
+    if not isinstance(request, dict):
+        raise SpecError("Request body must be a JSON object")
+    unknown = sorted(set(request) - set(DEFAULTS))
+    if unknown:
+        raise SpecError(f"Unknown keys {unknown}, expected a subset of {sorted(DEFAULTS)}")
+    spec = {**DEFAULTS, **request}
+
+    if spec['kind'] not in KINDS:
+        raise SpecError(f"Unknown kind '{spec['kind']}', expected one of {KINDS}")
+    for key in ('outcome', 'treatment'):
+        if not isinstance(spec[key], str) or spec[key] not in df.columns:
+            raise SpecError(f"Unknown {key} column '{spec[key]}'")
+        if not pd.api.types.is_numeric_dtype(df[spec[key]]):
+            raise SpecError(f"{key} column '{spec[key]}' is not numeric")
+    years = spec['years']
+    if not (isinstance(years, list) and len(years) == 2 and all(_is_int(y) for y in years)
+            and years[0] < years[1]):
+        raise SpecError(f"years must be [start, end] integers with start < end, got {years}")
+    for key in ('post_year', 'ref_year'):
+        if not _is_int(spec[key]):
+            raise SpecError(f"{key} must be an integer, got {spec[key]!r}")
+    if spec['kind'] == 'did' and not years[0] < spec['post_year'] <= years[1]:
+        raise SpecError(f"post_year {spec['post_year']} leaves no pre or post period in years {years}")
+    if spec['kind'] == 'event_study' and not years[0] <= spec['ref_year'] <= years[1]:
+        raise SpecError(f"ref_year {spec['ref_year']} is outside years {years}")
+
+    # The treatment indicator is interacted with year dummies, so it must be a clean 0/1 split
+    window = df.loc[(df['Year'] >= years[0]) & (df['Year'] <= years[1]), spec['treatment']]
+    if window.empty:
+        raise SpecError(f"No rows in years {years}")
+    if window.isna().any() or not window.isin([0, 1]).all():
+        raise SpecError(f"treatment column '{spec['treatment']}' must be 0/1 with no missing values in years {years}")
+    if window.nunique() < 2:
+        raise SpecError(f"treatment column '{spec['treatment']}' is constant in years {years}")
+    if spec['cov_type'] not in COV_TYPES:
+        raise SpecError(f"Unknown cov_type '{spec['cov_type']}', expected one of {COV_TYPES}")
+    if spec['cov_type'] == 'conley' and centroids is None:
+        raise SpecError(f"Conley SEs need {CENTROIDS_FILE}")
+    cutoff = spec['cutoff_km']
+    if not (isinstance(cutoff, (int, float)) and not isinstance(cutoff, bool) and cutoff > 0):
+        raise SpecError(f"cutoff_km must be a positive number, got {cutoff!r}")
+    if spec['kernel'] not in KERNELS:
+        raise SpecError(f"Unknown kernel '{spec['kernel']}', expected one of {KERNELS}")
+    lag = spec['lag_cutoff']
+    if lag is not None and not (_is_int(lag) and lag >= 0):
+        raise SpecError(f"lag_cutoff must be a non-negative integer or null, got {lag!r}")
+    return spec
+
+def input_signature():
+    """(path, size, mtime) of every input file, used to detect changes on disk."""
+    sig = []
+    for pattern in INPUT_PATTERNS:
+        for path in sorted(glob.glob(pattern)):
+            st = os.stat(path)
+            sig.append((path, st.st_size, st.st_mtime_ns))
+    return tuple(sig)
+
+class AnalysisState:
+    """Panel, centroids and fitted results kept resident between requests."""
+
+    def __init__(self):
+        self.df = None
+        self.centroids = None
+        self.signature = None
+        self.version = 0
+        self.loaded_at = None
+        self.cache = {}
+
+    def ensure_loaded(self, force=False):
+        sig = input_signature()
+        if not force and self.df is not None and sig == self.signature:
+            return False
+        print("--- Inputs changed, reloading ---" if self.df is not None else "--- Initial load ---")
+        self.df = load_data()
+        self.centroids = load_centroids() if os.path.exists(CENTROIDS_FILE) else None
+        self.signature = sig
+        self.version += 1
+        self.loaded_at = time.time()
+        self.cache = {}
+        return True
+
+    def status(self):
+        return {
+            'data_version': self.version,
+            'loaded_at': self.loaded_at,
+            'nobs': 0 if self.df is None else len(self.df.index),
+            'columns': [] if self.df is None else list(self.df.columns),
+            'cached_results': len(self.cache),
+        }
+
+    def run(self, request):
+        spec = validate_spec(request, self.df, self.centroids)
+        key = json.dumps(spec, sort_keys=True)
+        if key in self.cache:
+            return self.cache[key], True
+        result = run_spec(self.df, spec, self.centroids)
+        self.cache[key] = result
+        return result, False
+
+def _cov_config(spec, centroids):
+    if spec['cov_type'] != 'conley':
+        return None
+    return {'centroids': centroids, 'cutoff_km': float(spec['cutoff_km']),
+            'kernel': spec['kernel'], 'lag_cutoff': spec['lag_cutoff']}
+
+def _coef_table(res, names):
+    ci = res.conf_int()
+    return [{
+        'term': name,
+        'estimate': float(res.params[name]),
+        'std_error': float(res.std_errors[name]),
+        'pvalue': float(res.pvalues[name]),
+        'lower': float(ci.loc[name].iloc[0]),
+        'upper': float(ci.loc[name].iloc[1]),
+    } for name in names]
+
+def run_spec(df, spec, centroids=None):
+    """Fits one specification that has already passed validate_spec on the resident panel."""
+    start, end = spec['years']
+    data = df[(df['Year'] >= start) & (df['Year'] <= end)].copy()
+    treat = data[spec['treatment']].astype(int)
+
+    if spec['kind'] == 'did':
+        data['Treat_Post'] = treat * (data['Year'] >= spec['post_year']).astype(int)
+        terms = ['Treat_Post']
+    else:
+        terms = []
+        for year in sorted(data['Year'].unique()):
+            if year == spec['ref_year']: continue
+            data[f'T_{year}'] = treat * (data['Year'] == year).astype(int)
+            terms.append(f'T_{year}')
+
+    formula = f"{spec['outcome']} ~ {' + '.join(terms)} + EntityEffects + TimeEffects"
+    mod = PanelOLS.from_formula(formula, data=data.set_index(['msoa21cd', 'Year']))
+    res = fit_panel(mod, spec['cov_type'], _cov_config(spec, centroids))
+    return {'formula': formula, 'nobs': int(res.nobs), 'coefficients': _coef_table(res, terms)}
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != '/status':
+                return self._reply(404, {'error': f"Unknown path '{self.path}'"})
+            self._reply(200, state.status())
+
+        def do_POST(self):
+            t0 = time.perf_counter()
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    request = json.loads(self.rfile.read(length) or b'{}')
+                except json.JSONDecodeError as e:
+                    raise SpecError(f"Invalid JSON: {e}")
+                if self.path == '/reload':
+                    state.ensure_loaded(force=True)
+                    return self._reply(200, state.status())
+                if self.path != '/run':
+                    return self._reply(404, {'error': f"Unknown path '{self.path}'"})
+                reloaded = state.ensure_loaded()
+                result, cached = state.run(request)
+            except SpecError as e:
+                return self._reply(400, {'error': str(e)})
+            except Exception as e:
+                # Anything past validation is a fault in the data or the estimators
+                return self._reply(500, {'error': f"{type(e).__name__}: {e}"})
+            self._reply(200, {
+                **result,
+                'cached': cached,
+                'reloaded': reloaded,
+                'data_version': state.version,
+                'elapsed_ms': round((time.perf_counter() - t0) * 1000, 2),
+            })
+
+        def log_message(self, fmt, *args):
+            print(f"[daemon] {self.address_string()} {fmt % args}")
+
+    return Handler
+
+def serve(port=DEFAULT_PORT):
+    state = AnalysisState()
+    state.ensure_loaded()
+    # Bound to loopback only: the daemon is a local stand-in, not a service
+    server = HTTPServer(('127.0.0.1', port), make_handler(state))
+    print(f"Analysis daemon listening on http://127.0.0.1:{port} (POST /run, POST /reload, GET /status)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    serve(args.port)
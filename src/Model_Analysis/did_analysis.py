@@ -1,9 +1,9 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import statsmodels.api as sm
-from statsmodels.stats.outliers_influence import variance_inflation_factor
 from linearmodels.panel import PanelOLS
+from spatial_hac import load_centroids, fit_conley
+from epc_aggregates import load_epc_aggregates
+import argparse
 import os
 import glob
 
@@ -18,30 +18,13 @@ def load_data():
     
     elig = pd.read_csv(os.path.join(METADATA_DIR, 'policy_eligibility.csv'))
     
-    epc_files = sorted(glob.glob(os.path.join(RAW_DIR, "domestic-*.csv")))
-    df_list = []
-    for f in epc_files:
-        try:
-            df = pd.read_csv(f, usecols=['POSTCODE', 'LODGEMENT_DATE', 'CURRENT_ENERGY_EFFICIENCY'])
-            df_list.append(df)
-        except: pass
-    epc = pd.concat(df_list, ignore_index=True)
-    epc['LODGEMENT_DATE'] = pd.to_datetime(epc['LODGEMENT_DATE'], errors='coerce')
-    epc['Year'] = epc['LODGEMENT_DATE'].dt.year
-    epc = epc.dropna(subset=['Year'])
-    epc['Year'] = epc['Year'].astype(int)
-    epc = epc[(epc['Year'] >= 2015) & (epc['Year'] <= 2024)]
-    
     lookup = pd.read_csv(os.path.join(RAW_DIR, "lookup.csv"), dtype=str)
     pcd_col = 'pcds' if 'pcds' in lookup.columns else 'pcd7'
-    epc['clean_pcode'] = epc['POSTCODE'].str.replace(" ", "").str.upper()
     lookup['clean_pcode'] = lookup[pcd_col].str.replace(" ", "").str.upper()
     
-    merged_epc = epc.merge(lookup[['clean_pcode', 'msoa21cd']], on='clean_pcode')
-    epc_agg = merged_epc.groupby(['msoa21cd', 'Year']).agg(
-        Num_Upgrades=('CURRENT_ENERGY_EFFICIENCY', 'count'),
-        Avg_EPC=('CURRENT_ENERGY_EFFICIENCY', 'mean')
-    ).reset_index()
+    # Only new or changed domestic-*.csv files are parsed; see epc_aggregates.py
+    epc_agg = load_epc_aggregates(lookup)
+    epc_agg = epc_agg[(epc_agg['Year'] >= 2015) & (epc_agg['Year'] <= 2024)].reset_index(drop=True)
     
     imd = pd.read_csv(os.path.join(RAW_DIR, "deprivation.csv"))
     imd_col = imd.columns[7] # Income Score
@@ -99,8 +82,21 @@ def load_data():
     
     return final
 
-def analyse(df):
+def fit_panel(mod, cov_type='clustered', cov_config=None):
+    """Fits a PanelOLS model with entity-clustered or Conley spatial-HAC SEs."""
+    if cov_type == 'clustered':
+        return mod.fit(cov_type='clustered', cluster_entity=True)
+    if cov_type == 'conley':
+        return fit_conley(mod, **(cov_config or {}))
+    raise ValueError(f"Unknown cov_type '{cov_type}', expected 'clustered' or 'conley'")
+
+def analyse(df, cov_type='clustered', cov_config=None):
     print("--- Running Analysis ---")
+    if cov_type == 'conley':
+        cov_config = dict(cov_config or {})
+        cov_config.setdefault('centroids', load_centroids())
+        print(f"Standard Errors: Conley spatial-HAC ({cov_config.get('kernel', 'bartlett')}, "
+              f"{cov_config.get('cutoff_km', 10.0)} km)")
     
     baseline_mean = df[df['Year'] < 2019]['COPD_Rate'].mean()
     print(f"Baseline COPD Rate (Pre-2019): {baseline_mean:.2f}")
@@ -130,7 +126,7 @@ def analyse(df):
 
     print("\n--- First Stage Verification ---")
     mod_fs = PanelOLS.from_formula('Num_Upgrades ~ Eligible + TimeEffects', data=df_panel)
-    res_fs = mod_fs.fit(cov_type='clustered', cluster_entity=True)
+    res_fs = fit_panel(mod_fs, cov_type, cov_config)
     print(res_fs)
     
     with open(os.path.join(OUTPUT_DIR, "first_stage_upgrades.txt"), "w") as f:
@@ -140,14 +136,14 @@ def analyse(df):
 
     print("\n--- Mechanism Check: EPC Score DiD ---")
     mod_epc = PanelOLS.from_formula('Avg_EPC ~ Treatment_Group:Post_Policy + EntityEffects + TimeEffects', data=df_panel)
-    res_epc = mod_epc.fit(cov_type='clustered', cluster_entity=True)
+    res_epc = fit_panel(mod_epc, cov_type, cov_config)
     print(res_epc)
     
     with open(os.path.join(OUTPUT_DIR, "mechanism_epc.txt"), "w") as f:
         f.write(str(res_epc.summary))
     
     mod = PanelOLS.from_formula('COPD_Rate ~ Treatment_Group:Post_Policy + EntityEffects + TimeEffects', data=df_panel)
-    res = mod.fit(cov_type='clustered', cluster_entity=True)
+    res = fit_panel(mod, cov_type, cov_config)
     print(res)
     
     coef = res.params['Treatment_Group:Post_Policy']
@@ -161,6 +157,7 @@ def analyse(df):
 
     df.to_csv(os.path.join(OUTPUT_DIR, "did_results.csv"), index=False)
     
+    import matplotlib.pyplot as plt # Deferred so importers (e.g. analysis_daemon) skip it
     trends = df.groupby(['Year', 'Treatment_Group'])['COPD_Rate'].mean().unstack()
     plt.figure(figsize=(10, 6))
     plt.plot(trends.index, trends[0], label='Ineligible (Control)', color='blue', marker='o')
@@ -172,5 +169,17 @@ def analyse(df):
     plt.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cov-type', choices=['clustered', 'conley'], default='clustered')
+    parser.add_argument('--cutoff-km', type=float, default=10.0, help="Conley kernel cutoff")
+    parser.add_argument('--kernel', choices=['bartlett', 'uniform'], default='bartlett')
+    parser.add_argument('--lag-cutoff', type=int, default=None,
+                        help="Conley serial lags (default: all years, as entity clustering)")
+    args = parser.parse_args()
+
+    cov_config = None
+    if args.cov_type == 'conley':
+        cov_config = {'cutoff_km': args.cutoff_km, 'kernel': args.kernel, 'lag_cutoff': args.lag_cutoff}
+
     df = load_data()
-    analyse(df)
\ No newline at end of file
+    analyse(df, args.cov_type, cov_config)
\ No newline at end of file
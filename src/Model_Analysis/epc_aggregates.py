@@ -0,0 +1,210 @@
+import pandas as pd
+import hashlib
+import json
+import warnings
+import io
+import os
+import glob
+
+RAW_DIR = os.path.join("01_Data", "Raw_Data")
+PROCESSED_DIR = os.path.join("01_Data", "Processed_Data")
+STATE_FILE = os.path.join(PROCESSED_DIR, "epc_agg_state.csv")
+MANIFEST_FILE = os.path.join(PROCESSED_DIR, "epc_manifest.json")
+EPC_COLS = ['POSTCODE', 'LODGEMENT_DATE', 'CURRENT_ENERGY_EFFICIENCY']
+STATE_COLS = ['file', 'msoa21cd', 'Year', 'Count', 'Sum']
+STATE_DTYPES = {'file': str, 'msoa21cd': str, 'Year': 'int64', 'Count': 'int64', 'Sum': 'float64'}
+CHUNK_ROWS = 500_000
+WINDOW_BYTES = 1 << 20
+
+class _BoundedReader(io.RawIOBase):
+    """Reads at most `remaining` bytes from f, counting double quotes as they pass."""
+
+    def __init__(self, f, remaining):
+        self._f = f
+        self._remaining = remaining
+        self.quotes = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        data = self._f.read(min(len(buf), self._remaining))
+        buf[:len(data)] = data
+        self._remaining -= len(data)
+        self.quotes += data.count(b'"')
+        return len(data)
+
+def _window_sha256(path, offset):
+    """Hash of the first and last WINDOW_BYTES before offset (at most 2 MB read)."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        h.update(f.read(min(WINDOW_BYTES, offset)))
+        tail_start = max(WINDOW_BYTES, offset - WINDOW_BYTES)
+        if tail_start < offset:
+            f.seek(tail_start)
+            h.update(f.read(offset - tail_start))
+    return h.hexdigest()
+
+def _signature(path):
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+def _last_line_end(path, start, size):
+    """Byte offset just past the last newline in [start, size), or start if there is none."""
+    with open(path, 'rb') as f:
+        pos = size
+        while pos > start:
+            block_start = max(start, pos - WINDOW_BYTES)
+            f.seek(block_start)
+            idx = f.read(pos - block_start).rfind(b'\n')
+            if idx >= 0:
+                return block_start + idx + 1
+            pos = block_start
+    return start
+
+def _empty_state():
+    return pd.DataFrame({c: pd.Series(dtype=t) for c, t in STATE_DTYPES.items()})
+
+def _load_state():
+    if os.path.exists(MANIFEST_FILE) and os.path.exists(STATE_FILE):
+        with open(MANIFEST_FILE) as f:
+            manifest = json.load(f)
+        state = pd.read_csv(STATE_FILE, dtype=STATE_DTYPES)
+        return manifest, state
+    return {'lookup': None, 'files': {}}, _empty_state()
+
+def _save_state(manifest, state):
+    os.makedirs(PROCESSED_DIR, exist_ok=True)
+    state.to_csv(STATE_FILE, index=False)
+    with open(MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+def _aggregate_chunk(df, pcode_map):
+    df['LODGEMENT_DATE'] = pd.to_datetime(df['LODGEMENT_DATE'], errors='coerce')
+    df['Year'] = df['LODGEMENT_DATE'].dt.year
+    df = df.dropna(subset=['Year'])
+    df['Year'] = df['Year'].astype(int)
+    df['clean_pcode'] = df['POSTCODE'].str.replace(" ", "").str.upper()
+
+    merged = df.merge(pcode_map, on='clean_pcode')
+    return merged.groupby(['msoa21cd', 'Year']).agg(
+        Count=('CURRENT_ENERGY_EFFICIENCY', 'count'),
+        Sum=('CURRENT_ENERGY_EFFICIENCY', 'sum')
+    ).reset_index()
+
+def _aggregate_rows(path, offset, end, columns, pcode_map):
+    """
+    Streams the rows in bytes [offset, end) of path in CHUNK_ROWS chunks and
+    returns (per-(msoa21cd, Year) counts and sums, header columns, rows read).
+
+    end is the last newline in the file. A quoted field may itself contain
+    newlines, so the quotes that pass through are counted: an odd count means
+    the cut fell inside a record that is still being written, and the file is
+    rejected rather than split mid-record.
+    """
+    if offset == 0:
+        columns = list(pd.read_csv(path, nrows=0).columns)
+    aggs, n_rows = [], 0
+    if end > offset:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            reader = _BoundedReader(f, end - offset)
+            kwargs = {'usecols': EPC_COLS, 'chunksize': CHUNK_ROWS}
+            if offset:
+                kwargs.update(header=None, names=columns)
+            for chunk in pd.read_csv(io.BufferedReader(reader), **kwargs):
+                n_rows += len(chunk.index)
+                aggs.append(_aggregate_chunk(chunk, pcode_map))
+        if reader.quotes % 2:
+            raise ValueError(f"last complete line at byte {end} is inside a quoted field")
+
+    if not aggs:
+        return _empty_state().drop(columns='file'), columns, n_rows
+    agg = pd.concat(aggs, ignore_index=True)
+    agg = agg.groupby(['msoa21cd', 'Year'], as_index=False)[['Count', 'Sum']].sum()
+    return agg.astype({'Count': 'int64', 'Sum': 'float64'}), columns, n_rows
+
+def update_epc_aggregates(lookup, epc_files=None):
+    """
+    Brings the persisted per-file (msoa21cd, Year) counts and sums up to date
+    with the domestic-*.csv files on disk and returns the merged state.
+
+    Unchanged files are skipped. Files that only grew are parsed from their
+    row watermark (the byte offset of the last processed line), checked by
+    hashing the first and last WINDOW_BYTES before it; a same-length edit
+    between those windows goes unnoticed. Any other change, or a new lookup,
+    re-aggregates the affected files from scratch.
+    lookup must carry the 'clean_pcode' and 'msoa21cd' columns.
+    """
+    if epc_files is None:
+        epc_files = sorted(glob.glob(os.path.join(RAW_DIR, "domestic-*.csv")))
+    manifest, state = _load_state()
+    pcode_map = lookup[['clean_pcode', 'msoa21cd']]
+
+    lookup_path = os.path.join(RAW_DIR, "lookup.csv")
+    lookup_sig = _signature(lookup_path) if os.path.exists(lookup_path) else None
+    if manifest['lookup'] != lookup_sig:
+        # Postcodes may now map to different MSOAs, so nothing can be reused
+        manifest, state = {'lookup': lookup_sig, 'files': {}}, _empty_state()
+
+    keys = {os.path.basename(f): f for f in epc_files}
+    stale = set(manifest['files']) - set(keys)
+    if stale:
+        print(f"Dropping EPC aggregates for removed files: {sorted(stale)}")
+        state = state[~state['file'].isin(stale)]
+        for key in stale: del manifest['files'][key]
+
+    for key, path in keys.items():
+        entry = manifest['files'].get(key)
+        sig = _signature(path)
+        if entry is not None and entry['size'] == sig['size'] and entry['mtime_ns'] == sig['mtime_ns']:
+            continue
+
+        offset, columns = 0, None
+        if (entry is not None and sig['size'] >= entry['offset']
+                and _window_sha256(path, entry['offset']) == entry['window_sha256']):
+            offset, columns = entry['offset'], entry['columns']
+        end = _last_line_end(path, offset, sig['size'])
+
+        try:
+            agg, columns, n_rows = _aggregate_rows(path, offset, end, columns, pcode_map)
+        except Exception as e:
+            if offset:
+                # The rows before the watermark are still valid: keep them and the
+                # manifest entry, so the next run retries from the same offset
+                warnings.warn(f"Deferring appended rows of {key} past byte {offset}: {e}")
+                continue
+            # Nothing usable was read, so leave the file out until it parses
+            warnings.warn(f"Omitting {key} from the EPC aggregates: {e}")
+            state = state[state['file'] != key]
+            manifest['files'].pop(key, None)
+            continue
+        print(f"{key}: {'appended' if offset else 'full'} ingest of {n_rows} certificates")
+
+        if not offset:
+            state = state[state['file'] != key]
+        agg.insert(0, 'file', key)
+        if len(agg.index):
+            state = pd.concat([state, agg], ignore_index=True)
+            state = state.groupby(['file', 'msoa21cd', 'Year'], as_index=False)[['Count', 'Sum']].sum()
+        manifest['files'][key] = {
+            **sig,
+            'offset': end,
+            'window_sha256': _window_sha256(path, end),
+            'rows': (entry['rows'] if offset else 0) + n_rows,
+            'columns': columns,
+        }
+
+    state = state[STATE_COLS].astype(STATE_DTYPES)
+    _save_state(manifest, state)
+    return state
+
+def load_epc_aggregates(lookup, epc_files=None):
+    """Returns epc_agg (msoa21cd, Year, Num_Upgrades, Avg_EPC) from the incremental state."""
+    state = update_epc_aggregates(lookup, epc_files)
+    epc_agg = state.groupby(['msoa21cd', 'Year'], as_index=False)[['Count', 'Sum']].sum()
+    count = epc_agg['Count'].astype('int64')
+    epc_agg['Year'] = epc_agg['Year'].astype(int)
+    epc_agg['Num_Upgrades'] = count
+    epc_agg['Avg_EPC'] = epc_agg['Sum'].astype('float64') / count.where(count > 0)
+    return epc_agg[['msoa21cd', 'Year', 'Num_Upgrades', 'Avg_EPC']]
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The pipeline scripts import their siblings by name, as they do when run directly
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src", "Model_Analysis"))
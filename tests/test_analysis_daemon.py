@@ -0,0 +1,98 @@
+import json
+import threading
+from http.server import HTTPServer
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis_daemon import AnalysisState, SpecError, make_handler, validate_spec
+
+
+@pytest.fixture
+def panel():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame([(f"E0200{i:04d}", y) for i in range(60) for y in range(2015, 2025)],
+                      columns=['msoa21cd', 'Year'])
+    df['Eligible'] = (df['msoa21cd'].str[-1].astype(int) % 3 == 0).astype(int)
+    df['COPD_Rate'] = rng.normal(100, 5, len(df)) + 3 * df['Eligible'] * (df['Year'] >= 2019)
+    df['Score'] = rng.normal(0, 1, len(df))
+    df['Label'] = 'x'
+    # Only the 2015 cohort is eligible, so the treatment is constant in later windows
+    df['Early'] = ((df['Year'] == 2015) & (df['Eligible'] == 1)).astype(int)
+    # Missing only in 2016, so windows starting later can still use it
+    df['Gappy'] = df['Eligible'].astype(float).where(df['Year'] != 2016)
+    return df
+
+
+@pytest.mark.parametrize('request_body, message', [
+    ([1], "JSON object"),
+    ({'foo': 1}, "Unknown keys"),
+    ({'kind': 'x'}, "Unknown kind"),
+    ({'outcome': 'Nope'}, "Unknown outcome"),
+    ({'outcome': 'Label'}, "not numeric"),
+    ({'years': [2015]}, "start < end"),
+    ({'years': [2019, 2019]}, "start < end"),
+    ({'years': [2015, 2024], 'post_year': 2015}, "no pre or post period"),
+    ({'years': [2015, 2018], 'post_year': 2019}, "no pre or post period"),
+    ({'kind': 'event_study', 'ref_year': 2030}, "outside years"),
+    ({'treatment': 'Score'}, "must be 0/1"),
+    ({'treatment': 'Gappy'}, "must be 0/1"),
+    ({'treatment': 'Early', 'years': [2016, 2024]}, "constant"),
+    ({'years': [2030, 2031], 'post_year': 2031}, "No rows"),
+    ({'cov_type': 'conley'}, "Conley SEs need"),
+    ({'cutoff_km': '5'}, "cutoff_km"),
+    ({'lag_cutoff': -1}, "lag_cutoff"),
+])
+def test_validate_spec_rejects(panel, request_body, message):
+    with pytest.raises(SpecError, match=message):
+        validate_spec(request_body, panel)
+
+
+def test_validate_spec_fills_defaults(panel):
+    spec = validate_spec({'kind': 'event_study', 'years': [2017, 2020], 'treatment': 'Gappy'}, panel)
+    assert spec['outcome'] == 'COPD_Rate' and spec['ref_year'] == 2018
+
+
+@pytest.fixture
+def server(panel, monkeypatch):
+    monkeypatch.setattr('analysis_daemon.load_data', lambda: panel.copy())
+    monkeypatch.setattr('analysis_daemon.input_signature', lambda: ())
+    state = AnalysisState()
+    state.ensure_loaded()
+    httpd = HTTPServer(('127.0.0.1', 0), make_handler(state))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(url, body):
+    try:
+        with urlopen(Request(url + '/run', data=body)) as r:
+            return r.status, json.load(r)
+    except HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_run_and_cache(server):
+    status, first = post(server, json.dumps({'post_year': 2019}).encode())
+    assert status == 200 and not first['cached']
+    assert first['coefficients'][0]['term'] == 'Treat_Post'
+    status, second = post(server, b'{}')
+    assert status == 200 and second['cached']
+    assert second['coefficients'] == first['coefficients']
+
+
+@pytest.mark.parametrize('body', [
+    b'{bad',
+    json.dumps({'years': [2019, 2019]}).encode(),
+    json.dumps({'post_year': 2015}).encode(),
+    json.dumps({'treatment': 'Score'}).encode(),
+    json.dumps({'treatment': 'Early', 'years': [2016, 2024]}).encode(),
+])
+def test_bad_specs_are_400(server, body):
+    status, payload = post(server, body)
+    assert status == 400, payload
@@ -0,0 +1,132 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import epc_aggregates
+from epc_aggregates import EPC_COLS, RAW_DIR, load_epc_aggregates
+
+POSTCODES = [f"M{i} {j}AB" for i in range(30) for j in range(6)]
+
+
+def from_scratch(lookup):
+    """The whole-file aggregation that did_analysis did before the incremental state."""
+    files = sorted(glob.glob(os.path.join(RAW_DIR, "domestic-*.csv")))
+    epc = pd.concat([pd.read_csv(f, usecols=EPC_COLS) for f in files], ignore_index=True)
+    epc['LODGEMENT_DATE'] = pd.to_datetime(epc['LODGEMENT_DATE'], errors='coerce')
+    epc['Year'] = epc['LODGEMENT_DATE'].dt.year
+    epc = epc.dropna(subset=['Year'])
+    epc['Year'] = epc['Year'].astype(int)
+    epc['clean_pcode'] = epc['POSTCODE'].str.replace(" ", "").str.upper()
+    merged = epc.merge(lookup[['clean_pcode', 'msoa21cd']], on='clean_pcode')
+    return merged.groupby(['msoa21cd', 'Year']).agg(
+        Num_Upgrades=('CURRENT_ENERGY_EFFICIENCY', 'count'),
+        Avg_EPC=('CURRENT_ENERGY_EFFICIENCY', 'mean')
+    ).reset_index()
+
+
+def assert_matches(got, expected):
+    pd.testing.assert_frame_equal(got, expected, check_exact=True)
+
+
+@pytest.fixture
+def certificates():
+    rng = np.random.default_rng(0)
+
+    def make(n):
+        dates = pd.Timestamp('2014-01-01') + pd.to_timedelta(rng.integers(0, 4000, n), unit='D')
+        return pd.DataFrame({
+            'LMK_KEY': rng.integers(0, 10**9, n),
+            'ADDRESS': rng.choice(['1 High St', '"Flat 2", Mill Ln', 'Unit 3\nOld Works'], n),
+            'POSTCODE': rng.choice(POSTCODES, n),
+            'LODGEMENT_DATE': dates.strftime('%Y-%m-%d'),
+            'CURRENT_ENERGY_EFFICIENCY': np.where(rng.random(n) < 0.05, np.nan, rng.integers(1, 100, n)),
+        })
+    return make
+
+
+@pytest.fixture
+def lookup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(epc_aggregates, 'CHUNK_ROWS', 97) # Exercise the chunked path
+    os.makedirs(RAW_DIR)
+    lookup = pd.DataFrame({'pcds': POSTCODES,
+                           'msoa21cd': [f"E0200{i % 17:04d}" for i in range(len(POSTCODES))]})
+    lookup.to_csv(os.path.join(RAW_DIR, "lookup.csv"), index=False)
+    lookup = pd.read_csv(os.path.join(RAW_DIR, "lookup.csv"), dtype=str)
+    lookup['clean_pcode'] = lookup['pcds'].str.replace(" ", "").str.upper()
+    return lookup
+
+
+@pytest.fixture
+def paths():
+    return tuple(os.path.join(RAW_DIR, f"domestic-{n}.csv") for n in ("A", "B"))
+
+
+def test_cold_and_warm_match_from_scratch(lookup, certificates, paths):
+    a, b = paths
+    certificates(800).to_csv(a, index=False)
+    certificates(500).to_csv(b, index=False)
+    expected = from_scratch(lookup)
+    cold = load_epc_aggregates(lookup)
+    assert_matches(cold, expected)
+    assert cold.dtypes['Num_Upgrades'] == 'int64'
+    assert_matches(load_epc_aggregates(lookup), expected)
+
+
+def test_appends_and_partial_lines(lookup, certificates, paths):
+    a, b = paths
+    certificates(800).to_csv(a, index=False)
+    certificates(500).to_csv(b, index=False)
+    load_epc_aggregates(lookup)
+
+    certificates(60).to_csv(a, index=False, header=False, mode='a')
+    assert_matches(load_epc_aggregates(lookup), from_scratch(lookup))
+
+    # A half-written record waits for the next drop; the rows before it are used now
+    with open(b, 'ab') as f:
+        certificates(40).to_csv(f, index=False, header=False)
+    expected = from_scratch(lookup)
+    with open(b, 'ab') as f:
+        f.write(b'123,1 High St,M1 0AB,2020-0')
+    assert_matches(load_epc_aggregates(lookup), expected)
+    with open(b, 'ab') as f:
+        f.write(b'5-01,55\n')
+    assert_matches(load_epc_aggregates(lookup), from_scratch(lookup))
+
+    # The last newline is inside a quoted field: the append is deferred, not dropped
+    expected = from_scratch(lookup)
+    with open(a, 'ab') as f:
+        f.write(b'124,"Unit 9\nPart')
+    with pytest.warns(UserWarning, match="Deferring appended rows of domestic-A.csv"):
+        assert_matches(load_epc_aggregates(lookup), expected)
+    with open(a, 'ab') as f:
+        f.write(b'ial",M2 1AB,2021-03-01,61\n')
+    assert_matches(load_epc_aggregates(lookup), from_scratch(lookup))
+
+
+def test_rewrite_and_removal(lookup, certificates, paths):
+    a, b = paths
+    certificates(800).to_csv(a, index=False)
+    certificates(500).to_csv(b, index=False)
+    load_epc_aggregates(lookup)
+
+    certificates(300).to_csv(b, index=False)
+    assert_matches(load_epc_aggregates(lookup), from_scratch(lookup))
+    os.remove(a)
+    assert_matches(load_epc_aggregates(lookup), from_scratch(lookup))
+
+
+def test_failed_full_ingest_omits_file(lookup, certificates, paths):
+    a, b = paths
+    certificates(800).to_csv(a, index=False)
+    expected = from_scratch(lookup)
+    with open(b, 'wb') as f:
+        f.write(b'LMK_KEY,ADDRESS,POSTCODE,LODGEMENT_DATE,CURRENT_ENERGY_EFFICIENCY\n124,"Unit 9\nPart')
+    with pytest.warns(UserWarning, match="Omitting domestic-B.csv"):
+        assert_matches(load_epc_aggregates(lookup), expected)
+    with open(b, 'ab') as f:
+        f.write(b'ial",M2 1AB,2021-03-01,61\n')
+    assert_matches(load_epc_aggregates(lookup), from_scratch(lookup))
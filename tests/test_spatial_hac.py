@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from linearmodels.panel import PanelOLS
+
+from spatial_hac import EARTH_RADIUS_KM, _demean, fit_conley, kernel_weights
+
+
+def _haversine_km(lat, lon):
+    phi, lam = np.radians(lat), np.radians(lon)
+    hav = (np.sin((phi[:, None] - phi) / 2) ** 2 +
+           np.cos(phi[:, None]) * np.cos(phi) * np.sin((lam[:, None] - lam) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(hav, 1.0)))
+
+
+def _dense_conley(x, resid, lat, lon, years, cutoff_km, kernel, lag_cutoff):
+    """Brute-force O((NT)^2) Conley sandwich built from row labels, not entity codes."""
+    dist = _haversine_km(lat, lon)
+    spatial = np.where(dist < cutoff_km, 1 - dist / cutoff_km if kernel == 'bartlett' else 1.0, 0.0)
+    same_place = (lat[:, None] == lat) & (lon[:, None] == lon)
+    lag = np.abs(years[:, None] - years)
+    if lag_cutoff is None:
+        serial = np.ones_like(lag, dtype=float)
+    else:
+        serial = np.where(lag <= lag_cutoff, 1 - lag / (lag_cutoff + 1), 0.0)
+    K = np.where(lag == 0, spatial, np.where(same_place, serial, 0.0))
+    u = x * resid[:, None]
+    bread = np.linalg.inv(x.T @ x)
+    return bread @ (u.T @ K @ u) @ bread
+
+
+@pytest.fixture
+def centroids():
+    rng = np.random.default_rng(0)
+    n_msoa = 80
+    return pd.DataFrame({'LAT': 53.48 + rng.normal(0, 0.05, n_msoa),
+                         'LONG': -2.24 + rng.normal(0, 0.08, n_msoa)},
+                        index=pd.Index([f"E0200{i:04d}" for i in range(n_msoa)], name='msoa21cd'))
+
+
+def _panel(centroids, shuffle, unbalanced):
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame([(m, y) for m in centroids.index for y in range(2015, 2025)],
+                      columns=['msoa21cd', 'Year'])
+    df['Treated'] = (df['msoa21cd'].str[-1].astype(int) % 3 == 0).astype(int)
+    df['Post'] = (df['Year'] >= 2019).astype(int)
+    df['Outcome'] = rng.normal(100, 5, len(df)) + 3 * df['Treated'] * df['Post']
+    if unbalanced:
+        df = df[rng.random(len(df)) >= 0.1].copy()
+        # An entity with no usable rows is dropped by PanelOLS but may stay in the index levels
+        df.loc[df['msoa21cd'] == centroids.index[7], 'Outcome'] = np.nan
+    if shuffle:
+        df = df.sample(frac=1, random_state=2)
+    return df.set_index(['msoa21cd', 'Year'])
+
+
+def test_kernel_weights_match_brute_force(centroids):
+    W = kernel_weights(centroids['LAT'], centroids['LONG'], 5.0)
+    dist = _haversine_km(centroids['LAT'].values, centroids['LONG'].values)
+    np.testing.assert_allclose(W.toarray(), np.where(dist < 5.0, 1 - dist / 5.0, 0.0), atol=1e-12)
+
+
+@pytest.mark.parametrize('shuffle', [False, True])
+@pytest.mark.parametrize('unbalanced', [False, True])
+@pytest.mark.parametrize('kernel, cutoff_km, lag_cutoff', [('uniform', 4.0, None), ('bartlett', 6.0, 2)])
+def test_fit_conley_matches_dense(centroids, shuffle, unbalanced, kernel, cutoff_km, lag_cutoff):
+    mod = PanelOLS.from_formula('Outcome ~ Treated:Post + EntityEffects + TimeEffects',
+                                data=_panel(centroids, shuffle, unbalanced))
+    res = fit_conley(mod, centroids, cutoff_km, kernel, lag_cutoff)
+
+    x = _demean(mod.exog, mod)
+    resid = _demean(mod.dependent, mod)[:, 0] - x @ res.params.values
+    coords = centroids.loc[mod.dependent.index.get_level_values(0)]
+    years = np.asarray(mod.dependent.index.get_level_values(1), dtype=float)
+    dense = _dense_conley(x, resid, coords['LAT'].values, coords['LONG'].values, years,
+                          cutoff_km, kernel, lag_cutoff) * res.base.nobs / res.base.df_resid
+    np.testing.assert_allclose(res.cov.values, dense, rtol=1e-10)
+
+
+def test_zero_cutoff_equals_entity_clustering(centroids):
+    mod = PanelOLS.from_formula('Outcome ~ Treated:Post + EntityEffects + TimeEffects',
+                                data=_panel(centroids, shuffle=True, unbalanced=False))
+    clustered = mod.fit(cov_type='clustered', cluster_entity=True)
+    conley = fit_conley(mod, centroids, cutoff_km=1e-6)
+    np.testing.assert_allclose(conley.std_errors.values, clustered.std_errors.values, rtol=1e-8)